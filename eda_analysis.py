@@ -18,12 +18,20 @@ Date: 2026-02-05
 
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Any
 
 import numpy as np
 import pandas as pd
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from scripts.db_loader import load_db
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -32,39 +40,84 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-class NumpyEncoder(json.JSONEncoder):
-    """Custom JSON encoder for numpy types."""
-    
-    def default(self, obj: Any) -> Any:
-        if isinstance(obj, np.integer):
-            return int(obj)
-        if isinstance(obj, np.floating):
-            return float(obj)
-        if isinstance(obj, np.ndarray):
-            return obj.tolist()
-        return super().default(obj)
-
 # Paths
 PROJECT_ROOT = Path(__file__).parent
 DATABASE_PATH = PROJECT_ROOT / "soro-map-mvp" / "antivenom_db.xlsx"
+LOADER_PATH = PROJECT_ROOT / "scripts" / "db_loader.py"
 OUTPUT_DIR = PROJECT_ROOT / ".database_info"
+FINGERPRINT_PATH = OUTPUT_DIR / ".fingerprint"
+OUTPUT_FILES = (
+    "summary.json",
+    "by_region.json",
+    "by_state.json",
+    "by_municipality.json",
+    "coordinates_stats.json",
+    "eda_report.md",
+)
+
+# Source columns to load, mapped to their standardized names
+COLUMN_MAPPING = {
+    'Region': 'region',
+    'Federal_Un': 'federal_unit',
+    'FU': 'uf',
+    'Municipio': 'municipio',
+    'Unidade de': 'unidade',
+    'Endereço': 'endereco',
+    'Telefone': 'telefone',
+    'CNES': 'cnes',
+    'Atendiment': 'atendimento_tipo',
+    'Atendime_1': 'atendimento_info',
+    'Lat (Y)': 'latitude',
+    'Lon (X)': 'longitude',
+}
+
+
+def compute_fingerprint() -> str:
+    """
+    Fingerprint the inputs of the analysis (database, loader and this script).
+    
+    Returns:
+        String built from the size and modification time of each input.
+    """
+    parts = []
+    for path in (DATABASE_PATH, LOADER_PATH, Path(__file__)):
+        stat = path.stat()
+        parts.append(f"{stat.st_size}:{stat.st_mtime_ns}")
+    return "|".join(parts)
+
+
+def is_up_to_date(fingerprint: str) -> bool:
+    """
+    Check whether the outputs were generated from the current inputs.
+    
+    Args:
+        fingerprint: Fingerprint of the current inputs.
+    
+    Returns:
+        True if the stored fingerprint matches and all outputs exist.
+    """
+    return (
+        FINGERPRINT_PATH.exists()
+        and FINGERPRINT_PATH.read_text() == fingerprint
+        and all((OUTPUT_DIR / name).exists() for name in OUTPUT_FILES)
+    )
 
 
 def load_database() -> pd.DataFrame:
     """
     Load the antivenom database from Excel file.
     
+    The parsed sheet is cached as Parquet next to the workbook and reused
+    on later runs while the workbook is unchanged.
+    
     Returns:
         DataFrame with the database contents.
     
     Raises:
         FileNotFoundError: If database file doesn't exist.
     """
-    if not DATABASE_PATH.exists():
-        raise FileNotFoundError(f"Database not found at {DATABASE_PATH}")
-    
     logger.info(f"Loading database from {DATABASE_PATH}")
-    df = pd.read_excel(DATABASE_PATH)
+    df = load_db(DATABASE_PATH, usecols=list(COLUMN_MAPPING))
     logger.info(f"Loaded {len(df)} records with {len(df.columns)} columns")
     
     return df
@@ -74,60 +127,49 @@ def clean_column_names(df: pd.DataFrame) -> pd.DataFrame:
     """
     Standardize column names for easier processing.
     
+    Low-cardinality text columns are converted to ``category`` so that
+    grouping and ``nunique`` work on integer codes instead of strings.
+    
     Args:
         df: Input DataFrame.
     
     Returns:
         DataFrame with cleaned column names.
     """
-    column_mapping = {
-        'Region': 'region',
-        'Federal_Un': 'federal_unit',
-        'FU': 'uf',
-        'Municipio': 'municipio',
-        'Unidade de': 'unidade',
-        'Endereço': 'endereco',
-        'Telefone': 'telefone',
-        'CNES': 'cnes',
-        'Atendiment': 'atendimento_tipo',
-        'Atendime_1': 'atendimento_info',
-        'Lat (Y)': 'latitude',
-        'Lon (X)': 'longitude',
-    }
+    df = df.rename(columns=COLUMN_MAPPING)
     
-    df = df.rename(columns=column_mapping)
-    # Drop unnecessary columns
-    cols_to_drop = ['unknown', 'layer', 'path']
-    df = df.drop(columns=[c for c in cols_to_drop if c in df.columns], errors='ignore')
+    for col in ('region', 'uf', 'federal_unit', 'municipio', 'atendimento_tipo'):
+        if col in df.columns:
+            df[col] = df[col].astype('category')
     
     return df
 
 
-def calculate_summary_stats(df: pd.DataFrame) -> dict[str, Any]:
+def calculate_summary_stats(df: pd.DataFrame, coord_mask: pd.Series) -> dict[str, Any]:
     """
     Calculate general summary statistics.
     
     Args:
         df: Input DataFrame.
+        coord_mask: Boolean mask of rows with both latitude and longitude.
     
     Returns:
         Dictionary with summary statistics.
     """
+    # One isna() pass feeds both the presence counts and missing_data
+    na_counts = df.isna().sum()
+    
     stats = {
         "total_centers": len(df),
         "total_states": df['uf'].nunique(),
         "total_regions": df['region'].nunique(),
         "total_municipalities": df['municipio'].nunique(),
-        "centers_with_cnes": df['cnes'].notna().sum(),
-        "centers_with_phone": df['telefone'].notna().sum(),
-        "centers_with_coordinates": (
-            df['latitude'].notna() & df['longitude'].notna()
-        ).sum(),
+        "centers_with_cnes": len(df) - int(na_counts['cnes']),
+        "centers_with_phone": len(df) - int(na_counts['telefone']),
+        "centers_with_coordinates": int(coord_mask.sum()),
         "columns": list(df.columns),
         "missing_data": {
-            col: int(df[col].isna().sum()) 
-            for col in df.columns 
-            if df[col].isna().sum() > 0
+            col: int(n) for col, n in na_counts.items() if n > 0
         },
     }
     
@@ -145,22 +187,28 @@ def analyze_by_region(df: pd.DataFrame) -> list[dict[str, Any]]:
     Returns:
         List of region statistics.
     """
-    region_stats = []
-    
-    for region in df['region'].unique():
-        region_df = df[df['region'] == region]
-        
-        region_stats.append({
-            "region": region,
-            "total_centers": len(region_df),
-            "percentage": round(len(region_df) / len(df) * 100, 2),
-            "states": region_df['uf'].nunique(),
-            "municipalities": region_df['municipio'].nunique(),
-            "states_list": sorted(region_df['uf'].unique().tolist()),
-        })
+    grouped = df.groupby('region', sort=False, observed=True)
+    region_stats = grouped.agg(
+        total_centers=('region', 'size'),
+        states=('uf', 'nunique'),
+        municipalities=('municipio', 'nunique'),
+    )
+    # Categories are already sorted, so sorting the integer codes of each
+    # group sorts its UFs. agg() would cast list results back to the
+    # categorical dtype, hence apply().
+    uf_categories = df['uf'].cat.categories
+    region_stats['states_list'] = grouped['uf'].apply(
+        lambda s: uf_categories[np.sort(s.dropna().cat.codes.unique())].tolist()
+    )
+    region_stats['percentage'] = (region_stats['total_centers'] / len(df) * 100).round(2)
     
     # Sort by total_centers descending
-    region_stats.sort(key=lambda x: x['total_centers'], reverse=True)
+    region_stats = (
+        region_stats.reset_index()
+        .sort_values('total_centers', ascending=False, kind='stable')
+        [['region', 'total_centers', 'percentage', 'states', 'municipalities', 'states_list']]
+        .to_dict('records')
+    )
     
     logger.info(f"Analyzed {len(region_stats)} regions")
     return region_stats
@@ -176,23 +224,25 @@ def analyze_by_state(df: pd.DataFrame) -> list[dict[str, Any]]:
     Returns:
         List of state statistics.
     """
-    state_stats = []
-    
-    for uf in df['uf'].unique():
-        state_df = df[df['uf'] == uf]
-        
-        state_stats.append({
-            "uf": uf,
-            "federal_unit": state_df['federal_unit'].iloc[0] if 'federal_unit' in state_df.columns else uf,
-            "region": state_df['region'].iloc[0],
-            "total_centers": len(state_df),
-            "percentage": round(len(state_df) / len(df) * 100, 2),
-            "municipalities": state_df['municipio'].nunique(),
-            "centers_per_municipality": round(len(state_df) / state_df['municipio'].nunique(), 2),
-        })
+    state_stats = df.groupby('uf', sort=False, observed=True).agg(
+        federal_unit=('federal_unit' if 'federal_unit' in df.columns else 'uf', 'first'),
+        region=('region', 'first'),
+        total_centers=('uf', 'size'),
+        municipalities=('municipio', 'nunique'),
+    )
+    state_stats['percentage'] = (state_stats['total_centers'] / len(df) * 100).round(2)
+    state_stats['centers_per_municipality'] = (
+        state_stats['total_centers'] / state_stats['municipalities']
+    ).round(2)
     
     # Sort by total_centers descending
-    state_stats.sort(key=lambda x: x['total_centers'], reverse=True)
+    state_stats = (
+        state_stats.reset_index()
+        .sort_values('total_centers', ascending=False, kind='stable')
+        [['uf', 'federal_unit', 'region', 'total_centers', 'percentage',
+          'municipalities', 'centers_per_municipality']]
+        .to_dict('records')
+    )
     
     logger.info(f"Analyzed {len(state_stats)} states")
     return state_stats
@@ -209,8 +259,16 @@ def analyze_top_municipalities(df: pd.DataFrame, top_n: int = 20) -> list[dict[s
     Returns:
         List of municipality statistics.
     """
-    muni_counts = df.groupby(['municipio', 'uf', 'region']).size().reset_index(name='total_centers')
-    muni_counts = muni_counts.sort_values('total_centers', ascending=False).head(top_n)
+    # DataFrame.value_counts() groups categoricals with observed=False, which
+    # would count every municipio/uf/region combination; nlargest() also
+    # avoids fully sorting the ~1.7k groups just to keep the top N.
+    muni_counts = (
+        df.groupby(['municipio', 'uf', 'region'], sort=False, observed=True)
+        .size()
+        .nlargest(top_n)
+        .rename('total_centers')
+        .reset_index()
+    )
     
     result = muni_counts.to_dict('records')
     logger.info(f"Top municipality: {result[0]['municipio']} with {result[0]['total_centers']} centers")
@@ -218,30 +276,32 @@ def analyze_top_municipalities(df: pd.DataFrame, top_n: int = 20) -> list[dict[s
     return result
 
 
-def analyze_coordinates(df: pd.DataFrame) -> dict[str, Any]:
+def analyze_coordinates(df: pd.DataFrame, coord_mask: pd.Series) -> dict[str, Any]:
     """
     Analyze geographic coordinates for map bounds.
     
     Args:
         df: Input DataFrame.
+        coord_mask: Boolean mask of rows with both latitude and longitude.
     
     Returns:
         Dictionary with coordinate statistics.
     """
-    valid_coords = df[df['latitude'].notna() & df['longitude'].notna()]
+    valid_coords = df.loc[coord_mask, ['latitude', 'longitude']]
+    agg = valid_coords.agg(['min', 'max', 'mean'])
     
     stats = {
         "total_with_coordinates": len(valid_coords),
         "total_missing_coordinates": len(df) - len(valid_coords),
         "bounds": {
-            "min_lat": float(valid_coords['latitude'].min()),
-            "max_lat": float(valid_coords['latitude'].max()),
-            "min_lng": float(valid_coords['longitude'].min()),
-            "max_lng": float(valid_coords['longitude'].max()),
+            "min_lat": float(agg.at['min', 'latitude']),
+            "max_lat": float(agg.at['max', 'latitude']),
+            "min_lng": float(agg.at['min', 'longitude']),
+            "max_lng": float(agg.at['max', 'longitude']),
         },
         "center": {
-            "lat": float(valid_coords['latitude'].mean()),
-            "lng": float(valid_coords['longitude'].mean()),
+            "lat": float(agg.at['mean', 'latitude']),
+            "lng": float(agg.at['mean', 'longitude']),
         },
     }
     
@@ -269,7 +329,7 @@ def generate_markdown_report(
     Returns:
         Markdown formatted report string.
     """
-    report = f"""# Antivenom Database - Exploratory Data Analysis
+    parts: list[str] = [f"""# Antivenom Database - Exploratory Data Analysis
 
 ## Summary
 
@@ -289,36 +349,36 @@ def generate_markdown_report(
 
 | Region | Centers | % | States | Municipalities |
 |--------|---------|---|--------|----------------|
-"""
+"""]
     
     for r in by_region:
-        report += f"| {r['region']} | {r['total_centers']:,} | {r['percentage']}% | {r['states']} | {r['municipalities']} |\n"
+        parts.append(f"| {r['region']} | {r['total_centers']:,} | {r['percentage']}% | {r['states']} | {r['municipalities']} |\n")
     
-    report += """
+    parts.append("""
 ---
 
 ## Top 10 States
 
 | UF | Region | Centers | % | Municipalities |
 |----|--------|---------|---|----------------|
-"""
+""")
     
     for s in by_state[:10]:
-        report += f"| {s['uf']} | {s['region']} | {s['total_centers']:,} | {s['percentage']}% | {s['municipalities']} |\n"
+        parts.append(f"| {s['uf']} | {s['region']} | {s['total_centers']:,} | {s['percentage']}% | {s['municipalities']} |\n")
     
-    report += """
+    parts.append("""
 ---
 
 ## Top 10 Municipalities
 
 | Municipality | UF | Region | Centers |
 |--------------|----|----|---------|
-"""
+""")
     
     for m in top_municipalities[:10]:
-        report += f"| {m['municipio']} | {m['uf']} | {m['region']} | {m['total_centers']} |\n"
+        parts.append(f"| {m['municipio']} | {m['uf']} | {m['region']} | {m['total_centers']} |\n")
     
-    report += f"""
+    parts.append(f"""
 ---
 
 ## Geographic Bounds
@@ -340,34 +400,40 @@ def generate_markdown_report(
 
 | Column | Missing Count |
 |--------|---------------|
-"""
+""")
     
     for col, count in summary.get('missing_data', {}).items():
-        report += f"| {col} | {count} |\n"
+        parts.append(f"| {col} | {count} |\n")
     
     if not summary.get('missing_data'):
-        report += "| - | No missing data |\n"
+        parts.append("| - | No missing data |\n")
     
-    report += """
+    parts.append("""
 ---
 
 *Report generated automatically by eda_analysis.py*
-"""
+""")
     
-    return report
+    return ''.join(parts)
 
 
 def save_json(data: Any, filename: str) -> None:
     """
     Save data to JSON file.
     
+    Uses orjson when installed, falling back to the standard json module.
+    
     Args:
         data: Data to save.
         filename: Output filename.
     """
     filepath = OUTPUT_DIR / filename
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2, cls=NumpyEncoder)
+    if orjson is not None:
+        with open(filepath, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    else:
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
     logger.info(f"Saved {filepath}")
 
 
@@ -379,23 +445,36 @@ def main() -> None:
     OUTPUT_DIR.mkdir(exist_ok=True)
     logger.info(f"Output directory: {OUTPUT_DIR}")
     
+    # Skip the whole pipeline when the inputs haven't changed since the last run
+    fingerprint = compute_fingerprint() if DATABASE_PATH.exists() else None
+    if fingerprint and is_up_to_date(fingerprint):
+        logger.info("Outputs are up to date, nothing to do")
+        return
+    
     # Load and clean data
     df = load_database()
     df = clean_column_names(df)
     
+    # Rows with usable coordinates, shared by the summary and bounds analyses
+    coord_mask = df['latitude'].notna() & df['longitude'].notna()
+    
     # Perform analyses
-    summary = calculate_summary_stats(df)
+    summary = calculate_summary_stats(df, coord_mask)
     by_region = analyze_by_region(df)
     by_state = analyze_by_state(df)
     top_municipalities = analyze_top_municipalities(df)
-    coords = analyze_coordinates(df)
-    
-    # Save JSON outputs
-    save_json(summary, "summary.json")
-    save_json(by_region, "by_region.json")
-    save_json(by_state, "by_state.json")
-    save_json(top_municipalities, "by_municipality.json")
-    save_json(coords, "coordinates_stats.json")
+    coords = analyze_coordinates(df, coord_mask)
+    
+    # Save JSON outputs concurrently (serialization and file I/O release the GIL)
+    outputs = [
+        (summary, "summary.json"),
+        (by_region, "by_region.json"),
+        (by_state, "by_state.json"),
+        (top_municipalities, "by_municipality.json"),
+        (coords, "coordinates_stats.json"),
+    ]
+    with ThreadPoolExecutor(max_workers=len(outputs)) as executor:
+        list(executor.map(lambda args: save_json(*args), outputs))
     
     # Generate and save Markdown report
     report = generate_markdown_report(
@@ -406,6 +485,9 @@ def main() -> None:
         f.write(report)
     logger.info(f"Saved {report_path}")
     
+    if fingerprint:
+        FINGERPRINT_PATH.write_text(fingerprint)
+    
     # Print summary to console
     print("\n" + "=" * 60)
     print("EXPLORATORY DATA ANALYSIS COMPLETE")
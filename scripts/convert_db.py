@@ -2,12 +2,16 @@
 Convert Excel database to JSON for the frontend app.
 Run this script to generate the centros.json file.
 """
+import numpy as np
 import pandas as pd
 import json
-import math
 
-# Read Excel
-df = pd.read_excel('antivenom_db.xlsx')
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from db_loader import load_db
 
 # Map columns
 column_map = {
@@ -25,6 +29,9 @@ column_map = {
     'Lon (X)': 'longitude',
 }
 
+# Read Excel (cached as Parquet after the first run), only the mapped columns
+df = load_db('antivenom_db.xlsx', usecols=list(column_map))
+
 # Types of soro (distributed across records since not in original database)
 soro_types = [
     ['Antibotrópico', 'Anticrotálico'],
@@ -34,58 +41,48 @@ soro_types = [
     ['Antibotrópico', 'Anticrotálico', 'Antilaquético', 'Antielapídico'],
 ]
 
-def clean_value(val):
-    """Clean a value, returning None for empty/nan values."""
-    if pd.isna(val):
-        return None
-    val = str(val).strip()
-    if val == '' or val.lower() in ['nan', 'none', 'null']:
-        return None
-    return val
-
-def clean_number(val):
-    """Clean a numeric value."""
-    if pd.isna(val):
-        return 0.0
-    try:
-        num = float(val)
-        if math.isnan(num) or math.isinf(num):
-            return 0.0
-        return num
-    except:
-        return 0.0
-
-centros = []
-for idx, row in df.iterrows():
-    # Cycle through soro types
-    tipos_soro = soro_types[idx % len(soro_types)]
-    
-    # Clean CNES - should be integer as string
-    cnes_val = row.get('CNES')
-    if pd.notna(cnes_val):
-        try:
-            cnes = str(int(float(cnes_val)))
-        except:
-            cnes = None
-    else:
-        cnes = None
-    
-    centro = {
-        'id': str(idx + 1),
-        'nome': clean_value(row.get('Unidade de')) or f'Centro {idx + 1}',
-        'municipio': clean_value(row.get('Municipio')) or '',
-        'uf': clean_value(row.get('FU')) or '',
-        'regiao': clean_value(row.get('Region')) or '',
-        'latitude': clean_number(row.get('Lat (Y)')),
-        'longitude': clean_number(row.get('Lon (X)')),
-        'tiposSoro': tipos_soro,
-        'endereco': clean_value(row.get('Endereço')),
-        'telefone': clean_value(row.get('Telefone')),
-        'cnes': cnes,
-        'atendimentoTipo': clean_value(row.get('Atendiment')),
-        'atendimentoInfo': clean_value(row.get('Atendime_1')),
-    }
-    centros.append(centro)
+def clean_text(series):
+    """Clean a text column, returning missing for empty/nan values."""
+    s = series.astype('string').str.strip()
+    return s.mask(s.str.lower().isin(['', 'nan', 'none', 'null']))
+
+def clean_number(series):
+    """Clean a numeric column, using 0.0 for missing/invalid values."""
+    num = pd.to_numeric(series, errors='coerce').astype('float64')
+    return num.where(np.isfinite(num), 0.0)
+
+def clean_cnes(series):
+    """Clean CNES codes - should be integers as strings."""
+    num = pd.to_numeric(series.astype('string').str.strip(), errors='coerce').astype('float64')
+    num = num.where(np.isfinite(num))
+    return np.trunc(num).astype('Int64').astype('string')
+
+# Clean whole columns at once instead of walking rows with iterrows()
+df = df.rename(columns=column_map).reset_index(drop=True)
+ids = pd.Series(range(1, len(df) + 1), index=df.index).astype(str)
+
+text_cols = ['nome', 'municipio', 'uf', 'regiao', 'endereco', 'telefone',
+             'atendimentoTipo', 'atendimentoInfo']
+for col in text_cols:
+    df[col] = clean_text(df[col])
+df['nome'] = df['nome'].fillna('Centro ' + ids)
+for col in ['municipio', 'uf', 'regiao']:
+    df[col] = df[col].fillna('')
+
+for col in ['latitude', 'longitude']:
+    df[col] = clean_number(df[col])
+df['cnes'] = clean_cnes(df['cnes'])
+
+df['id'] = ids
+# Cycle through soro types with a modulo-index gather
+soro_lists = pd.Series(soro_types, dtype=object).to_numpy()
+df['tiposSoro'] = soro_lists[np.arange(len(df)) % len(soro_types)]
+
+output_cols = ['id', 'nome', 'municipio', 'uf', 'regiao', 'latitude', 'longitude',
+               'tiposSoro', 'endereco', 'telefone', 'cnes', 'atendimentoTipo',
+               'atendimentoInfo']
+centros_df = df[output_cols].astype(object)
+centros = centros_df.where(centros_df.notna(), None).to_dict('records')
 
 # Save as JSON
 output_path = 'public/data/centros.json'
@@ -94,8 +91,12 @@ output_path = 'public/data/centros.json'
 import os
 os.makedirs('public/data', exist_ok=True)
 
-with open(output_path, 'w', encoding='utf-8') as f:
-    json.dump(centros, f, ensure_ascii=False, indent=2)
+if orjson is not None:
+    with open(output_path, 'wb') as f:
+        f.write(orjson.dumps(centros, option=orjson.OPT_INDENT_2))
+else:
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(centros, f, ensure_ascii=False, indent=2)
 
 print(f"✅ Generated {len(centros)} centros to {output_path}")
 print(f"Sample centro:")
@@ -0,0 +1,132 @@
+"""
+Shared loader for the antivenom Excel database.
+
+Parsing the xlsx file is by far the slowest step of the data scripts, so the
+raw sheet is cached in a Parquet sidecar next to the workbook
+(e.g. antivenom_db.xlsx -> antivenom_db.parquet). The sidecar is reused while
+it is at least as recent as the workbook and rebuilt otherwise.
+
+Requires pyarrow for the cache; without it the workbook is read directly.
+The workbook itself is parsed with the Rust-based calamine engine when
+python-calamine is installed, and with openpyxl otherwise. The cache always
+holds the full sheet; callers pass the columns they need and only those are
+read back from it.
+"""
+
+import importlib.util
+import logging
+from pathlib import Path
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def cache_path_for(xlsx_path: Path) -> Path:
+    """
+    Return the Parquet sidecar path for a workbook.
+
+    Args:
+        xlsx_path: Path to the Excel workbook.
+
+    Returns:
+        Path of the cache file.
+    """
+    return xlsx_path.with_suffix(".parquet")
+
+
+def _normalize_mixed_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Store mixed-type object columns as strings so they can be written to Parquet.
+
+    Columns such as CNES hold both integers and text ("Not informed1"),
+    which Arrow cannot represent in a single column.
+
+    Args:
+        df: DataFrame read from the workbook.
+
+    Returns:
+        DataFrame with mixed object columns converted to strings.
+    """
+    for col in df.columns:
+        if df[col].dtype == object:
+            df[col] = df[col].map(lambda v: v if pd.isna(v) else str(v))
+    return df
+
+
+def _calamine_available() -> bool:
+    """
+    Check whether pandas can use the calamine engine.
+
+    Returns:
+        True if python-calamine is installed and pandas is 2.2 or newer.
+    """
+    pandas_version = tuple(int(p) for p in pd.__version__.split(".")[:2])
+    return pandas_version >= (2, 2) and importlib.util.find_spec("python_calamine") is not None
+
+
+def _read_excel(xlsx_path: Path) -> pd.DataFrame:
+    """
+    Read the workbook, preferring the calamine engine.
+
+    Args:
+        xlsx_path: Path to the Excel workbook.
+
+    Returns:
+        DataFrame with the raw sheet contents.
+    """
+    if _calamine_available():
+        return pd.read_excel(xlsx_path, engine="calamine")
+    logger.info("calamine engine unavailable, using openpyxl")
+    return pd.read_excel(xlsx_path)
+
+
+def load_db(xlsx_path: Path | str, usecols: list[str] | None = None) -> pd.DataFrame:
+    """
+    Load the database, preferring the Parquet cache when it is fresh.
+
+    The cache stores every column of the sheet, so calls asking for
+    different subsets share it; ``usecols`` is applied when reading it.
+
+    Args:
+        xlsx_path: Path to the Excel workbook.
+        usecols: Columns to load, or None for all of them.
+
+    Returns:
+        DataFrame with the raw sheet contents.
+
+    Raises:
+        FileNotFoundError: If the workbook doesn't exist.
+        ValueError: If a requested column is not in the workbook.
+    """
+    xlsx_path = Path(xlsx_path)
+    if not xlsx_path.exists():
+        raise FileNotFoundError(f"Database not found at {xlsx_path}")
+
+    cache_path = cache_path_for(xlsx_path)
+    if cache_path.exists() and cache_path.stat().st_mtime >= xlsx_path.stat().st_mtime:
+        try:
+            df = pd.read_parquet(cache_path, engine="pyarrow", columns=usecols)
+            logger.info(f"Loaded cached database from {cache_path}")
+            return df
+        except ImportError:
+            logger.warning("pyarrow not installed, ignoring Parquet cache")
+        except Exception as e:
+            logger.info(f"Cache {cache_path} unusable ({type(e).__name__}), re-reading workbook")
+
+    df = _normalize_mixed_columns(_read_excel(xlsx_path))
+    try:
+        df.to_parquet(cache_path, engine="pyarrow", compression="zstd")
+        logger.info(f"Cached database to {cache_path}")
+    except ImportError:
+        logger.warning("pyarrow not installed, skipping Parquet cache")
+    except Exception as e:
+        logger.warning(f"Could not write cache {cache_path}: {e}")
+
+    if usecols is not None:
+        missing = [c for c in usecols if c not in df.columns]
+        if missing:
+            raise ValueError(f"Columns not found in {xlsx_path}: {missing}")
+        # Match the column order of the cached path
+        df = df[list(usecols)]
+    return df